@@ -0,0 +1,39 @@
+"""
+Measures the time to import each mwrogue module in a fresh interpreter, net of interpreter startup.
+
+Usage (with mwrogue installed or on PYTHONPATH): python benchmarks/import_time.py [number of runs]
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = [
+    'mwrogue',
+    'mwrogue.error_reporting.wiki_error',
+    'mwrogue.wiki_time_parser',
+    'mwrogue.lookup_cache',
+    'mwrogue.esports_client',
+    'mwrogue.template_modifier',
+]
+
+
+def time_command(code, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = time_command('pass', runs)
+    for module in MODULES:
+        duration = time_command('import {}'.format(module), runs) - baseline
+        print('{}: {:.1f}ms'.format(module, duration * 1000))
+
+
+if __name__ == '__main__':
+    main()
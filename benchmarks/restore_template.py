@@ -0,0 +1,43 @@
+"""
+Compares restoring a large scoreboard-sized template one parameter at a time vs. in a single pass.
+
+Usage (with mwrogue installed or on PYTHONPATH): python benchmarks/restore_template.py [number of params]
+"""
+import sys
+import timeit
+
+import mwparserfromhell
+
+from mwrogue.template_modifier import TemplateModifierBase
+
+
+def make_template(num_params, value):
+    text = '{{Scoreboard/Player' + ''.join('|field{}={}{}'.format(i, value, i) for i in range(num_params)) + '}}'
+    return mwparserfromhell.parse(text).filter_templates()[0]
+
+
+def restore_one_at_a_time(template, to_restore):
+    for param in template.params:
+        template.remove(param.name.strip())
+    for param in to_restore.params:
+        name = param.name.strip()
+        template.add(param.name, to_restore.get(name).value, preserve_spacing=False)
+
+
+def restore_single_pass(template, to_restore):
+    TemplateModifierBase.replace_params(template, list(to_restore.params))
+
+
+def main():
+    num_params = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for f in (restore_one_at_a_time, restore_single_pass):
+        template = make_template(num_params, 'new')
+        to_restore = make_template(num_params, 'old')
+        duration = timeit.timeit(lambda: f(template, to_restore), number=1)
+        # removing while iterating over params reorders them, so only compare the params themselves
+        assert sorted(map(str, template.params)) == sorted(map(str, to_restore.params))
+        print('{}: {:.4f}s for {} params'.format(f.__name__, duration, num_params))
+
+
+if __name__ == '__main__':
+    main()
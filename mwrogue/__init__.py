@@ -0,0 +1,30 @@
+import importlib
+
+# Submodules are only imported on first access, so that e.g. a script that only needs wiki_time_parser
+# doesn't pay for importing mwclient, mwcleric & mwparserfromhell
+_lazy_attributes = {
+    'AuthCredentials': 'mwrogue.auth_credentials',
+    'Cassette': 'mwrogue.cassette',
+    'EsportsClient': 'mwrogue.esports_client',
+    'EsportsLookupCache': 'mwrogue.lookup_cache',
+    'RequestScheduler': 'mwrogue.request_scheduler',
+    'RosterTable': 'mwrogue.roster_table',
+    'TemplateModifierBase': 'mwrogue.template_modifier',
+    'WikiTime': 'mwrogue.wiki_time',
+    'time_from_str': 'mwrogue.wiki_time_parser',
+    'time_from_template': 'mwrogue.wiki_time_parser',
+}
+
+__all__ = list(_lazy_attributes.keys())
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,26 @@
+def install_api_hooks(client):
+    """
+    Routes every API call of an mwclient Site through the RequestScheduler and Cassette set on it, if any.
+
+    The site keeps its original api method, and the scheduler & cassette are looked up on every call, so they
+    can be replaced or removed without stacking wrappers on sites that are shared by several clients.
+
+    :param client: mwclient Site object
+    :return: null
+    """
+    if getattr(client, 'mwrogue_unwrapped_api', None) is not None:
+        return
+    client.mwrogue_unwrapped_api = client.api
+
+    def hooked_api(action, http_method='POST', *args, **kwargs):
+        call = client.mwrogue_unwrapped_api
+        scheduler = getattr(client, 'mwrogue_scheduler', None)
+        if scheduler is not None:
+            call = scheduler.wrap(scheduler.get_wiki_key(client), call)
+        # the cassette goes outside the scheduler so that replayed responses don't use up any of the rate limit
+        cassette = getattr(client, 'mwrogue_cassette', None)
+        if cassette is not None:
+            call = cassette.wrap(cassette.get_wiki_key(client), call)
+        return call(action, http_method, *args, **kwargs)
+
+    client.api = hooked_api
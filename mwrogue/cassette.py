@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+
+from .api_hooks import install_api_hooks
+from .errors import CassetteAlreadyInstalledError, CassetteMissError, CassetteReplayWriteError
+
+# only responses to read-only actions are stored; everything else (edits, tokens, logins) goes to the wiki
+CACHEABLE_ACTIONS = {'query', 'cargoquery', 'expandtemplates', 'parse'}
+
+# props & meta modules whose responses describe the current state of a page or of the logged-in user,
+# which edits are based on
+CURRENT_STATE_PROPS = {'info', 'revisions'}
+CURRENT_STATE_META = {'userinfo'}
+
+# params that don't change the content of a response
+IGNORED_PARAMS = {'format', 'maxlag', 'assert', 'token'}
+
+
+def _save_responses(path, responses):
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(responses, f)
+    os.replace(tmp_path, path)
+
+
+class Cassette(object):
+    """
+    Records API responses to a compressed local file and replays them, so that scripts can be re-run
+    against the same wiki data without querying the wiki again.
+
+    Modes:
+
+    * record: always query the wiki, and store the response
+    * replay: only use stored responses, raising CassetteMissError if a request wasn't recorded. Nothing is ever
+      sent to the wiki, so edits and other non-recordable requests raise CassetteReplayWriteError.
+    * record_missing: use stored responses when available, otherwise query the wiki and store the response
+
+    Only read-only requests (query, cargoquery, expandtemplates, parse) are recorded. Outside of replay mode,
+    anything else is sent to the wiki.
+
+    Stored queries for page info, revisions, or user info are replayed like any other, so a stale revision may
+    be read in record_missing mode; the wiki then rejects edits based on it as edit conflicts. To read the
+    current state of the wiki instead, pass refresh_current_state=True, or only refresh it where it matters
+    by making the requests inside a `with cassette.refreshing():` block.
+
+    New responses are written to the file by save(), which is called when the cassette is used as a context
+    manager and exits. Otherwise, they're written when the cassette is garbage collected or the interpreter exits.
+
+    EsportsClient creates its own site when given a cassette, so site init can be replayed as well & the
+    cassette doesn't apply to other clients of the same wiki.
+    """
+    RECORD = 'record'
+    REPLAY = 'replay'
+    RECORD_MISSING = 'record_missing'
+
+    def __init__(self, path: str, mode: str = RECORD_MISSING, refresh_current_state: bool = False):
+        """
+        :param path: Path of the gzipped json file to store responses in; it will be created if needed
+        :param mode: One of record, replay, or record_missing
+        :param refresh_current_state: If True, queries for page info, revisions, or user info are always sent
+            to the wiki in record_missing mode
+        """
+        if mode not in (self.RECORD, self.REPLAY, self.RECORD_MISSING):
+            raise ValueError('Invalid cassette mode: {}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.refresh_current_state = refresh_current_state
+        self._local = threading.local()
+        self.responses = {}
+        self.changed = False
+        self._save_finalizer = None
+        self.clients = weakref.WeakSet()
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                self.responses = json.load(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for client in list(self.clients):
+            self.remove(client)
+        self.save()
+
+    @staticmethod
+    def normalize_params(action, params: dict):
+        """
+        :return: A json string of the request that doesn't depend on param order, types, or list formatting
+        """
+        normalized = {}
+        for key, value in params.items():
+            if key in IGNORED_PARAMS or value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = '|'.join(str(_) for _ in value)
+            normalized[key] = str(value)
+        return json.dumps([action, normalized], sort_keys=True)
+
+    @staticmethod
+    def is_cacheable(action, params: dict):
+        if action not in CACHEABLE_ACTIONS:
+            return False
+        # tokens have to be fresh
+        return 'tokens' not in str(params.get('meta', '')).split('|')
+
+    @staticmethod
+    def is_current_state(action, params: dict):
+        if action != 'query':
+            return False
+        if not CURRENT_STATE_PROPS.isdisjoint(str(params.get('prop', '')).split('|')):
+            return True
+        return not CURRENT_STATE_META.isdisjoint(str(params.get('meta', '')).split('|'))
+
+    @contextmanager
+    def refreshing(self):
+        """
+        Within this block, queries for page info, revisions, or user info made by the current thread are sent
+        to the wiki in record_missing mode, e.g. to check the current state of a page before editing it
+        """
+        previous = getattr(self._local, 'refreshing', False)
+        self._local.refreshing = True
+        try:
+            yield self
+        finally:
+            self._local.refreshing = previous
+
+    def _is_refreshed(self, action, params: dict):
+        if not (self.refresh_current_state or getattr(self._local, 'refreshing', False)):
+            return False
+        return self.is_current_state(action, params)
+
+    @staticmethod
+    def get_wiki_key(client):
+        return '{}{}'.format(client.host, client.path)
+
+    def key(self, wiki, action, params: dict):
+        # the wiki is part of the key since a cassette can be installed on sites for several wikis
+        return hashlib.sha1('{} {}'.format(wiki, self.normalize_params(action, params)).encode('utf-8')).hexdigest()
+
+    def wrap(self, wiki, api):
+        """
+        Wraps a function with the same signature as mwclient.Site.api so that its responses are recorded & replayed
+
+        :param wiki: Any identifier of the wiki, e.g. its host & path
+        :param api: The function to wrap
+        :return: The wrapped function
+        """
+        def wrapped_api(action, http_method='POST', *args, **kwargs):
+            params = dict(args, **kwargs)
+            if not self.is_cacheable(action, params):
+                if self.mode == self.REPLAY:
+                    raise CassetteReplayWriteError(action)
+                return api(action, http_method, *args, **kwargs)
+            key = self.key(wiki, action, params)
+            replayable = self.mode == self.REPLAY or (
+                self.mode == self.RECORD_MISSING and not self._is_refreshed(action, params)
+            )
+            if replayable and key in self.responses:
+                # stored as a string so that every caller gets a fresh copy
+                return json.loads(self.responses[key])
+            if self.mode == self.REPLAY:
+                raise CassetteMissError(wiki, action, self.normalize_params(action, params))
+            response = api(action, http_method, *args, **kwargs)
+            self.responses[key] = json.dumps(response)
+            if not self.changed:
+                # saved on exit if nothing else saves it first
+                self._save_finalizer = weakref.finalize(self, _save_responses, self.path, self.responses)
+                self.changed = True
+            return response
+
+        return wrapped_api
+
+    def install(self, client):
+        """
+        Routes all API calls made by an mwclient Site through this cassette. Site.get, Site.post, page methods,
+        and CargoClient.query all go through Site.api, so they are covered too.
+
+        The cassette applies to everything using the site, so a site can only have one cassette at a time.
+        It's removed when the cassette is used as a context manager and exits.
+
+        :param client: mwclient Site object
+        :return: null
+        """
+        existing = getattr(client, 'mwrogue_cassette', None)
+        if existing is self:
+            return
+        if existing is not None:
+            raise CassetteAlreadyInstalledError
+        install_api_hooks(client)
+        client.mwrogue_cassette = self
+        self.clients.add(client)
+
+    def remove(self, client):
+        """
+        Stops routing the API calls of an mwclient Site through this cassette
+
+        :param client: mwclient Site object
+        :return: null
+        """
+        if getattr(client, 'mwrogue_cassette', None) is self:
+            client.mwrogue_cassette = None
+        self.clients.discard(client)
+
+    def save(self):
+        if not self.changed:
+            return
+        self._save_finalizer.detach()
+        _save_responses(self.path, self.responses)
+        self.changed = False
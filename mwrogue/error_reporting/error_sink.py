@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import weakref
+from collections import OrderedDict
+from itertools import islice
+
+from .wiki_error import WikiError
+
+
+def _close_spill_file(handle, path, remove):
+    handle.close()
+    if remove and os.path.exists(path):
+        os.remove(path)
+
+
+class ErrorSink(object):
+    """Bounded, deduplicating store for WikiErrors
+
+    Identical errors are stored once along with a count. Once more than `max_entries` distinct errors are held
+    in memory, the oldest ones are spilled to a local file, so that long runs don't keep every error in memory.
+    Deduplication only applies to errors that are still in memory.
+
+    A temp spill file is removed when the sink is cleared or garbage collected, or when the interpreter exits.
+    A spill file provided by the caller is kept.
+    """
+
+    def __init__(self, max_entries: int = 500, spill_file: str = None):
+        """
+        :param max_entries: Maximum number of distinct errors to keep in memory
+        :param spill_file: Optional path of a local file to spill to. If not provided, a temp file will be used.
+        """
+        self.max_entries = max_entries
+        self.spill_file = spill_file
+        self.entries = OrderedDict()
+        self.num_spilled = 0
+        # number of lines at the start of the spill file that have been dropped
+        self._spill_offset = 0
+        self._spill_handle = None
+        self._spill_path = None
+        self._spill_finalizer = None
+
+    def __len__(self):
+        return len(self.entries) + self.num_spilled
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for error, _ in self.records():
+            yield error
+
+    def append(self, error: WikiError):
+        key = error.dedup_key()
+        if key in self.entries:
+            self.entries[key][1] += 1
+            return
+        self.entries[key] = [error, 1]
+        if len(self.entries) > self.max_entries:
+            _, (old_error, count) = self.entries.popitem(last=False)
+            self._spill(old_error, count)
+
+    @staticmethod
+    def format_entry(error: WikiError, count: int):
+        text = error.format_for_print()
+        if count > 1:
+            text = '{} (x{})'.format(text, count)
+        return text
+
+    def _spill(self, error: WikiError, count: int):
+        if self._spill_handle is None:
+            if self.spill_file is not None:
+                self._spill_path = self.spill_file
+            else:
+                fd, self._spill_path = tempfile.mkstemp(prefix='mwrogue_errors_', suffix='.jsonl')
+                os.close(fd)
+            self._spill_handle = open(self._spill_path, 'a', encoding='utf-8')
+            self._spill_finalizer = weakref.finalize(self, _close_spill_file, self._spill_handle,
+                                                     self._spill_path, self.spill_file is None)
+        record = error.to_dict()
+        record['count'] = count
+        self._spill_handle.write(json.dumps(record) + '\n')
+        self.num_spilled += 1
+
+    def records(self):
+        """
+        Yields every error along with its count, oldest first, without loading the spill file into memory
+
+        :return: generator of (WikiError, count) tuples
+        """
+        if self._spill_handle is not None:
+            self._spill_handle.flush()
+            with open(self._spill_path, 'r', encoding='utf-8') as f:
+                for line in islice(f, self._spill_offset, None):
+                    record = json.loads(line)
+                    yield WikiError.from_dict(record), record['count']
+        for error, count in self.entries.values():
+            yield error, count
+
+    def lines(self):
+        """
+        Yields every error formatted for printing, oldest first
+
+        :return: generator of strings
+        """
+        for error, count in self.records():
+            yield self.format_entry(error, count)
+
+    def write_json_lines(self, path: str):
+        """
+        Writes every error as a json line, with its count, for offline aggregation
+
+        :param path: Path of the file to append to
+        :return: null
+        """
+        with open(path, 'a', encoding='utf-8') as f:
+            for error, count in self.records():
+                record = error.to_dict()
+                record['count'] = count
+                f.write(json.dumps(record) + '\n')
+
+    def drop_oldest(self, count: int):
+        """
+        Removes the oldest errors, e.g. once they've been reported
+
+        :param count: Number of errors to remove, in the same order as records()
+        :return: null
+        """
+        num_spilled_dropped = min(count, self.num_spilled)
+        self._spill_offset += num_spilled_dropped
+        self.num_spilled -= num_spilled_dropped
+        for _ in range(min(count - num_spilled_dropped, len(self.entries))):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.num_spilled = 0
+        self._spill_offset = 0
+        if self._spill_handle is None:
+            return
+        self._spill_finalizer()
+        if self.spill_file is not None:
+            # truncate so that already-reported errors aren't reported again
+            open(self._spill_path, 'w').close()
+        self._spill_handle = None
+        self._spill_path = None
+        self._spill_finalizer = None
@@ -1,25 +1,70 @@
 import datetime
-import traceback
+import json
+import time
 
-import pytz
+LOG_TIMEZONE = 'America/Los_Angeles'
 
 
 class WikiError(object):
-    error_type = None
-    title = None
-    error = None
+    """Record of a single error, suitable for reporting to the wiki or serializing as a json line
+    """
+    __slots__ = ('title', 'error', 'error_type', 'created', 'monotonic')
 
-    def __init__(self):
-        self.timestamp = datetime.datetime.now(tz=pytz.timezone('America/Los_Angeles'))
-        self.date = self.timestamp.strftime('%Y-%m-%d')
+    def __init__(self, title: str = None, error: str = None, error_type: str = None):
+        self.title = title
+        self.error = error
+        self.error_type = error_type
+        # wall-clock time is only converted to a local date when the error is formatted
+        self.created = time.time()
+        self.monotonic = time.monotonic()
+
+    @property
+    def timestamp(self):
+        import pytz
+        return datetime.datetime.fromtimestamp(self.created, tz=pytz.timezone(LOG_TIMEZONE))
+
+    @property
+    def date(self):
+        return self.timestamp.strftime('%Y-%m-%d')
 
     def format_for_print(self):
-        error_text = self.error
-        if isinstance(self.error, Exception):
-            error_text = traceback.format_exception(None, self.error, self.error.__traceback__)
         return '{} - {}: {} - {}'.format(
             self.date,
             self.error_type,
             '[[{}]]'.format(self.title) if self.title else '(No title recorded)',
-            error_text
+            self.error
         )
+
+    def dedup_key(self):
+        """
+        Key identifying errors that should be considered identical when reporting
+
+        :return: tuple of error type, title, and error text
+        """
+        return self.error_type, self.title, self.error
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'error': self.error,
+            'error_type': self.error_type,
+            'created': self.created,
+            'monotonic': self.monotonic,
+        }
+
+    def to_json(self):
+        """
+        :return: A single-line json representation of the error, suitable for writing to a json lines file
+        """
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        error = WikiError.__new__(cls)
+        for key in WikiError.__slots__:
+            setattr(error, key, data.get(key))
+        return error
+
+    @classmethod
+    def from_json(cls, line: str):
+        return cls.from_dict(json.loads(line))
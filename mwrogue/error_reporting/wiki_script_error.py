@@ -1,12 +1,33 @@
+import traceback
+
 from .wiki_error import WikiError
 
+# tracebacks longer than this are trimmed from the start, since the last frames are the most useful
+MAX_TRACEBACK_LENGTH = 5000
+# used when we're given something other than an exception
+DEFAULT_ERROR_TYPE = 'Wiki Script Error'
+
 
 class WikiScriptError(WikiError):
     """Exceptions raised by scripts
+
+    The traceback is rendered when the error is created so that we don't keep the exception, and with it
+    every frame of the traceback, alive until the errors are reported.
     """
-    
+    __slots__ = ()
+
     def __init__(self, title: str = None, error: Exception = None):
-        super().__init__()
-        self.title = title
-        self.error = error
-        self.error_type = type(self.error)
+        error_type = type(error).__name__ if isinstance(error, BaseException) else DEFAULT_ERROR_TYPE
+        super().__init__(title=title, error=self.render_traceback(error), error_type=error_type)
+
+    @staticmethod
+    def render_traceback(error: Exception):
+        if error is None:
+            return 'No details provided'
+        if not isinstance(error, BaseException):
+            # some scripts log a message rather than the exception itself
+            return str(error)
+        text = ''.join(traceback.format_exception(type(error), error, error.__traceback__)).rstrip()
+        if len(text) > MAX_TRACEBACK_LENGTH:
+            text = '...' + text[-MAX_TRACEBACK_LENGTH:]
+        return text
@@ -23,3 +23,31 @@ class CantFindMatchHistory(KeyError):
 class InvalidEventError(KeyError):
     def __str__(self):
         return "Invalid page name provided for event"
+
+
+class CassetteMissError(KeyError):
+    def __init__(self, wiki, action, params):
+        self.wiki = wiki
+        self.action = action
+        self.params = params
+
+    def __str__(self):
+        return ("No recorded response from {} for {} request with params {}. "
+                "Record it first or use record_missing mode.").format(
+            self.wiki,
+            self.action,
+            self.params
+        )
+
+
+class CassetteReplayWriteError(Exception):
+    def __init__(self, action):
+        self.action = action
+
+    def __str__(self):
+        return "Cannot send {} request in replay mode, which never sends requests to the wiki.".format(self.action)
+
+
+class CassetteAlreadyInstalledError(Exception):
+    def __str__(self):
+        return "This site already has a different cassette installed. Remove it before installing another."
@@ -1,20 +1,26 @@
+import contextlib
 import copy
+import datetime
 import json
 import re
 
 import mwparserfromhell
 from mwclient.page import Page
-from typing import List, Union, Optional, Literal
+from typing import Iterable, List, Union, Optional, Literal
 
 from mwparserfromhell.nodes.extras import Parameter
 
 from .auth_credentials import AuthCredentials
+from .cassette import Cassette
 from mwcleric.clients.cargo_client import CargoClient
+from mwcleric.clients.session_manager import SessionManager
 
+from .error_reporting.error_sink import ErrorSink
 from .error_reporting.wiki_content_error import WikiContentError
 from .error_reporting.wiki_script_error import WikiScriptError
 from .errors import CantFindMatchHistory
 from .lookup_cache import EsportsLookupCache
+from .request_scheduler import RequestScheduler, default_scheduler
 from mwcleric.fandom_client import FandomClient
 from mwcleric.clients.site import Site
 from mwparserfromhell.nodes.template import Template
@@ -24,6 +30,18 @@ ALL_ESPORTS_WIKIS = ['lol', 'halo', 'smite', 'vg', 'rl', 'pubg', 'fortnite',
                      'splatoon2', 'legendsofruneterra',
                      'default-loadout', 'commons', 'teamfighttactics', 'valorant']
 
+# errors are appended to the log page in edits of at most this many bytes
+ERROR_REPORT_CHUNK_SIZE = 100000
+# errors are separated by ERROR_SEPARATOR, and by ERROR_SEPARATOR_PREFIX from what's already on the log page
+ERROR_SEPARATOR = '<br>\n'
+ERROR_SEPARATOR_PREFIX = '<br>'
+# once a log page is larger than this, further errors roll over to dated subpages
+ERROR_PAGE_MAX_SIZE = 1000000
+# parameters of WikiClient itself, rather than of the site that the session manager creates
+WIKI_CLIENT_PARAMS = {'max_retries', 'retry_interval', 'cargo'}
+# maximum number of events excluded by the condition from tournaments_to_skip_where_bounded
+TOURNAMENTS_TO_SKIP_WHERE_LIMIT = 100
+
 
 class EsportsClient(FandomClient):
     """
@@ -40,6 +58,8 @@ class EsportsClient(FandomClient):
                  credentials: AuthCredentials = None,
                  cache: EsportsLookupCache = None,
                  lang: str = None,
+                 cassette: Cassette = None,
+                 scheduler: RequestScheduler = None,
                  **kwargs):
         """
         Create a site object.
@@ -48,15 +68,78 @@ class EsportsClient(FandomClient):
         :param client: WikiClient object. If this is provided, SessionManager will not be used.
         :param credentials: Optional. Provide if you want a logged-in session.
         :param stg: if it's a staging wiki or not
+        :param cassette: Optional. Cassette to record & replay API responses with. Unless client is provided,
+            a dedicated site is created for it, so that site init & login go through the cassette too.
+            New responses are saved when the cassette exits as a context manager, on cassette.save(), or else
+            when the interpreter exits.
+        :param scheduler: Optional. RequestScheduler to rate-limit requests with. If not provided, a scheduler
+            shared by all EsportsClients in the process will be used.
         """
         self.wiki = self.get_wiki(wiki)
+        # set before logging in, since a relog reinstalls these
+        self.cassette = cassette
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+        self._owns_client = False
+        if cassette is not None and client is None:
+            # don't use the session manager's shared site, or the cassette would apply to every client of the wiki
+            session_kwargs = {k: v for k, v in kwargs.items() if k not in WIKI_CLIENT_PARAMS}
+            client = self._create_cassette_client('/' + ('' if lang is None else lang + '/'), credentials,
+                                                  **session_kwargs)
+            self._owns_client = True
 
         super().__init__(self.wiki, credentials=credentials, lang=lang, client=client, **kwargs)
+        if self._owns_client:
+            # WikiClient only sets this up when it creates the site itself
+            self._localization_cache = {}
+        self._install_client_hooks()
         if cache:
             self.cache = cache
         else:
             self.cache = EsportsLookupCache(self.client, cargo_client=self.cargo_client)
-        self.errors = []
+        self.errors = ErrorSink()
+
+    def relog(self):
+        if self._owns_client:
+            self.client = self._create_cassette_client(self.lang, self.credentials, scheme=self.scheme,
+                                                       max_retries_mwc=self.max_retries_mwc, **self.kwargs)
+            self.cargo_client = CargoClient(self.client)
+        else:
+            super().relog()
+        self._install_client_hooks()
+
+    def _create_cassette_client(self, path, credentials: AuthCredentials = None, max_retries_mwc: int = 0,
+                                **kwargs):
+        # a session manager of our own, so that the new site isn't shared with (or replace) other clients' sites
+        session_manager = SessionManager()
+        session_manager.existing_wikis = {}
+        # credentials aren't passed since the session manager would log in before the cassette is installed
+        if credentials is not None:
+            kwargs.setdefault('user_agent', credentials.user_agent)
+        client = session_manager.get_client(url='{}.fandom.com'.format(self.wiki), path=path,
+                                            max_retries=max_retries_mwc, force_new=True, do_init=False, **kwargs)
+        if credentials is not None and credentials.cloudflare_token_id and credentials.cloudflare_token_secret:
+            client.connection.headers['CF-Access-Client-Id'] = credentials.cloudflare_token_id
+            client.connection.headers['CF-Access-Client-Secret'] = credentials.cloudflare_token_secret
+        # install the cassette before site init so that it can be recorded & replayed
+        self.scheduler.install(client)
+        self.cassette.install(client)
+        client.site_init()
+        if credentials is not None and self.cassette.mode != Cassette.REPLAY:
+            # login reloads the user info, which mustn't be replayed from before we were logged in
+            with self.cassette.refreshing():
+                client.login(username=credentials.username, password=credentials.password)
+        return client
+
+    def _refreshing_current_state(self):
+        if self.cassette is None:
+            return contextlib.nullcontext()
+        return self.cassette.refreshing()
+
+    def _install_client_hooks(self):
+        # the cassette is installed last so that replayed responses don't use up any of the rate limit
+        self.scheduler.install(self.client)
+        if self.cassette is not None:
+            self.cassette.install(self.client)
 
     @staticmethod
     def get_wiki(wiki):
@@ -294,34 +377,135 @@ class EsportsClient(FandomClient):
     def log_error_content(self, title: str = None, text: str = None):
         self.errors.append(WikiContentError(title, error=text))
 
-    def report_all_errors(self, error_title):
+    def report_all_errors(self, error_title, chunk_size: int = ERROR_REPORT_CHUNK_SIZE,
+                          max_page_size: int = ERROR_PAGE_MAX_SIZE):
+        """
+        Appends all logged errors to the page Log:error_title and resets the error list.
+
+        Errors are sent in append-only edits of at most chunk_size bytes each. Once the log page reaches
+        max_page_size bytes, further errors are written to dated subpages, e.g. Log:error_title/2021-06-01.
+        If an edit fails, the errors that were already appended are removed from the error list, so that
+        they aren't reported twice when this is called again.
+
+        :param error_title: Title of the log page, without the Log: prefix
+        :param chunk_size: Maximum size in bytes of a single edit
+        :param max_page_size: Size in bytes after which we roll over to a new subpage
+        :return: null
+        """
         if not self.errors:
             return
-        error_page = self.client.pages['Log:' + error_title]
-        errors = [_.format_for_print() for _ in self.errors]
-        error_text = '<br>\n'.join(errors)
-        old_text = error_page.text(cache=False)
-        if not old_text:
-            new_text = error_text
-        else:
-            new_text = f"{old_text}<br>{error_text}"
-        self.save(error_page, new_text, summary="Reporting errors via mwrogue")
+        # number of errors that were appended, which mustn't be reported again if a later edit fails
+        num_sent = 0
+        try:
+            # page sizes decide where the errors go, so they mustn't come from a cassette
+            with self._refreshing_current_state():
+                error_page = self.client.pages['Log:' + error_title]
+                page_size = error_page.length or 0
+                chunk = []
+                # counts the separator added before the chunk in case the page isn't empty
+                chunk_bytes = len(ERROR_SEPARATOR_PREFIX)
+                for line in self.errors.lines():
+                    line_bytes = len(line.encode('utf-8'))
+                    if chunk and chunk_bytes + len(ERROR_SEPARATOR) + line_bytes > chunk_size:
+                        error_page, page_size = self._append_errors(error_title, error_page, page_size, chunk,
+                                                                    chunk_bytes, max_page_size)
+                        num_sent += len(chunk)
+                        chunk = []
+                        chunk_bytes = len(ERROR_SEPARATOR_PREFIX)
+                    if chunk:
+                        chunk_bytes += len(ERROR_SEPARATOR)
+                    chunk.append(line)
+                    chunk_bytes += line_bytes
+                self._append_errors(error_title, error_page, page_size, chunk, chunk_bytes, max_page_size)
+        except Exception:
+            self.errors.drop_oldest(num_sent)
+            raise
 
         # reset the list so we can reuse later if needed
-        self.errors = []
+        self.errors.clear()
+
+    def _append_errors(self, error_title, error_page, page_size, chunk, chunk_bytes, max_page_size):
+        if page_size > 0 and page_size + chunk_bytes > max_page_size:
+            error_page = self._get_rollover_error_page(error_title, chunk_bytes, max_page_size)
+            page_size = error_page.length or 0
+        error_text = ERROR_SEPARATOR.join(chunk)
+        if page_size > 0:
+            error_text = ERROR_SEPARATOR_PREFIX + error_text
+        self.append(error_page, error_text, summary="Reporting errors via mwrogue")
+        return error_page, page_size + len(error_text.encode('utf-8'))
+
+    def _get_rollover_error_page(self, error_title, chunk_bytes, max_page_size):
+        base_title = 'Log:{}/{}'.format(error_title, datetime.date.today().isoformat())
+        title = base_title
+        i = 1
+        while True:
+            page = self.client.pages[title]
+            if not page.exists or page.length + chunk_bytes <= max_page_size:
+                return page
+            i += 1
+            title = '{} {}'.format(base_title, i)
 
     def tournaments_to_skip(self, script):
-        result = self.cargo_client.query(
-            tables="TournamentScriptsToSkip",
-            fields="OverviewPage",
-            where=f'Script="{script}"'
-        )
-        tournaments_to_skip = []
-        for item in result:
-            tournaments_to_skip.append(item["OverviewPage"])
-        return tournaments_to_skip
+        """
+        Returns the events that a script should skip. Skips for every script are cached after the first call.
+
+        :param script: Name of the script, as in the Script field of TournamentScriptsToSkip
+        :return: frozenset of OverviewPages to skip
+        """
+        return self.cache.get_tournaments_to_skip(script)
+
+    def filter_tournaments_to_skip(self, script, rows: Iterable[dict], field: str = 'OverviewPage',
+                                   tournaments_to_skip: Iterable[str] = None):
+        """
+        Filters out rows, e.g. of a Cargo query result, whose event should be skipped by the script.
+
+        This is usually much faster than excluding every event in the query itself with tournaments_to_skip_where.
+
+        :param script: Name of the script, as in the Script field of TournamentScriptsToSkip
+        :param rows: Iterable of dicts
+        :param field: Key of each row containing the OverviewPage of the event
+        :param tournaments_to_skip: Optional. Events to filter out instead of all of the script's skips,
+            e.g. the leftover events from tournaments_to_skip_where_bounded
+        :return: generator of the rows that shouldn't be skipped
+        """
+        if tournaments_to_skip is None:
+            tournaments_to_skip = self.tournaments_to_skip(script)
+        elif not isinstance(tournaments_to_skip, (set, frozenset)):
+            tournaments_to_skip = frozenset(tournaments_to_skip)
+        for row in rows:
+            if row[field] not in tournaments_to_skip:
+                yield row
 
     def tournaments_to_skip_where(self, script, field):
-        tournaments_to_skip = self.tournaments_to_skip(script)
-        condition = ','.join(['"{}"'.format(_) for _ in tournaments_to_skip])
+        """
+        Returns a Cargo where condition excluding every event that the script should skip.
+
+        This condition grows with the number of skips; for long skip lists, use tournaments_to_skip_where_bounded.
+
+        :param script: Name of the script, as in the Script field of TournamentScriptsToSkip
+        :param field: Field of the query containing the OverviewPage of the event
+        :return: A Cargo where condition
+        """
+        return self._tournaments_to_skip_condition(sorted(self.tournaments_to_skip(script)), field)
+
+    def tournaments_to_skip_where_bounded(self, script, field, limit: int = TOURNAMENTS_TO_SKIP_WHERE_LIMIT):
+        """
+        Returns a Cargo where condition excluding at most `limit` of the events that the script should skip,
+        along with the remaining events, which should be filtered out of the results with
+        filter_tournaments_to_skip(script, rows, tournaments_to_skip=leftover).
+
+        :param script: Name of the script, as in the Script field of TournamentScriptsToSkip
+        :param field: Field of the query containing the OverviewPage of the event
+        :param limit: Maximum number of events to exclude in the condition
+        :return: A Cargo where condition, and a frozenset of the events that it doesn't exclude
+        """
+        tournaments_to_skip = sorted(self.tournaments_to_skip(script))
+        condition = self._tournaments_to_skip_condition(tournaments_to_skip[:limit], field)
+        return condition, frozenset(tournaments_to_skip[limit:])
+
+    @staticmethod
+    def _tournaments_to_skip_condition(tournaments_to_skip: List[str], field):
+        if not tournaments_to_skip:
+            return '1=1'
+        condition = ','.join(['"{}"'.format(_.replace('"', '\\"')) for _ in tournaments_to_skip])
         return f"{field} NOT IN ({condition})"
@@ -1,27 +1,64 @@
+import datetime
 import json
 import re
+from typing import Iterable, List, Tuple, TYPE_CHECKING
 
-from unidecode import unidecode
-
-from mwcleric.clients.cargo_client import CargoClient
 from .errors import EsportsCacheKeyError, InvalidEventError
-from mwcleric.clients.site import Site
+from .roster_table import RosterTable
+
+if TYPE_CHECKING:
+    # only used for type hints; importing mwcleric pulls in mwclient and is slow
+    from mwcleric.clients.cargo_client import CargoClient
+    from mwcleric.clients.site import Site
 
 
 class EsportsLookupCache(object):
-    def __init__(self, site: Site, cargo_client: CargoClient = None):
+    def __init__(self, site: 'Site', cargo_client: 'CargoClient' = None):
         self.site = site
         self.cargo_client = cargo_client
         self.cache = {}
         self.redirect_cache = {}
         self.event_tricode_cache = {}
         self.event_playername_cache = {}
+        self.roster_table = None
+        self.stale_roster_table_events = set()
+        self.stale_roster_table_tricodes = False
+        self.tournaments_to_skip_cache = None
 
     def clear(self):
         self.cache = {}
         self.redirect_cache = {}
         self.event_tricode_cache = {}
         self.event_playername_cache = {}
+        self.roster_table = None
+        self.stale_roster_table_events = set()
+        self.stale_roster_table_tricodes = False
+        self.tournaments_to_skip_cache = None
+
+    def export_rosters(self, path: str):
+        """
+        Saves the per-event player & tricode caches to a single compact binary file, which can be loaded with
+        load_rosters, e.g. in worker processes after prefetching every event in a parent process.
+
+        Entries from a previously-loaded roster file are not included.
+
+        :param path: Path of the file to write
+        :return: null
+        """
+        RosterTable.from_caches(self.event_playername_cache, self.event_tricode_cache).save(path)
+
+    def load_rosters(self, path: str, use_mmap: bool = True):
+        """
+        Loads per-event player & tricode data saved with export_rosters. Events that are already in the
+        regular caches take precedence over the loaded data.
+
+        :param path: Path of the file written by export_rosters
+        :param use_mmap: Memory-map the file instead of reading it, so that processes can share it without copying
+        :return: null
+        """
+        self.roster_table = RosterTable.load(path, use_mmap=use_mmap)
+        self.stale_roster_table_events = set()
+        self.stale_roster_table_tricodes = False
 
     def _get_json_lookup(self, filename):
         """
@@ -86,7 +123,87 @@ class EsportsLookupCache(object):
         title = title.replace('_', ' ')
         if title in self.redirect_cache:
             return self.redirect_cache[title]
-        return self.site.pages[title].resolve_redirect().name
+        target = self.site.pages[title].resolve_redirect().name
+        self.redirect_cache[title] = target
+        return target
+
+    def refresh_from_recent_changes(self, since: datetime.datetime):
+        """
+        Polls RecentChanges once and invalidates only the cache entries affected by edits, moves, and redirect
+        changes made since the specified time.
+
+        The returned time is the timestamp of the newest change seen, taken from the server rather than the local
+        clock, so passing it back in on the next refresh can't miss edits. The newest change is then seen twice,
+        which is harmless.
+
+        :param since: Time of the previous refresh (or of when the cache was first warmed); naive times are UTC
+        :return: UTC time to provide as `since` on the next refresh
+        """
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        changes = self.site.recentchanges(
+            start=since.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            dir='newer',
+            prop='title|loginfo|timestamp',
+            api_chunk_size='max'
+        )
+        titles = set()
+        newest = since
+        for change in changes:
+            titles.add(change['title'])
+            if change.get('logtype') == 'move':
+                # the old title is now a redirect and the new title may previously have been one
+                titles.add(change['logparams']['target_title'])
+            timestamp = datetime.datetime.strptime(change['timestamp'], '%Y-%m-%dT%H:%M:%SZ').replace(
+                tzinfo=datetime.timezone.utc)
+            newest = max(newest, timestamp)
+        self.invalidate_titles(titles)
+        return newest
+
+    def invalidate_titles(self, titles: Iterable[str]):
+        """
+        Invalidates every cache entry that depends on any of the provided pages:
+
+        * Lookup files whose module page (e.g. Module:Teamnames) or one of its subpages changed
+        * Redirects from or to a changed title
+        * Per-event data for a changed event page or one of its subpages (e.g. Team Rosters)
+        * Tournaments to skip, if anything changed at all, since they can be stored on any page
+
+        :param titles: Titles of pages that changed
+        :return: null
+        """
+        titles = {_.replace('_', ' ') for _ in titles}
+        if titles:
+            self.tournaments_to_skip_cache = None
+        # a page counts as changed if it or any of its subpages changed
+        changed = set()
+        for title in titles:
+            parts = title.split('/')
+            for i in range(1, len(parts) + 1):
+                changed.add('/'.join(parts[:i]))
+
+        for filename in list(self.cache.keys()):
+            if 'Module:{}names'.format(filename) in changed:
+                del self.cache[filename]
+                if filename == 'Team':
+                    # tricode lookups are resolved to team links when they're cached
+                    self.event_tricode_cache = {}
+                    self.stale_roster_table_tricodes = True
+
+        for title, target in list(self.redirect_cache.items()):
+            if title in titles or target in titles:
+                del self.redirect_cache[title]
+
+        for event_cache in (self.event_tricode_cache, self.event_playername_cache):
+            for event in list(event_cache.keys()):
+                if event in changed:
+                    del event_cache[event]
+
+        if self.roster_table is not None:
+            # the roster table is read-only, so just stop using it for these events
+            for title in changed:
+                if self.roster_table.has_player_event(title) or self.roster_table.has_tricode_event(title):
+                    self.stale_roster_table_events.add(title)
 
     def get_team_from_event_tricode(self, event, tricode):
         """
@@ -111,6 +228,10 @@ class EsportsLookupCache(object):
         if event in self.event_tricode_cache:
             if tricode in self.event_tricode_cache[event]:
                 return self.event_tricode_cache[event][tricode]
+            return None
+        if self.roster_table is not None and not self.stale_roster_table_tricodes \
+                and event not in self.stale_roster_table_events:
+            return self.roster_table.get_tricode(event, tricode)
         return None
 
     def _populate_event_tricodes(self, event):
@@ -131,6 +252,31 @@ class EsportsLookupCache(object):
                 d[short.lower()] = link
         self.event_tricode_cache[event] = d
 
+    def get_tournaments_to_skip(self, script):
+        """
+        Returns the events that a script should skip, per the TournamentScriptsToSkip table.
+
+        The first time this is called, skips for every script are loaded in a single query.
+
+        :param script: Name of the script, as in the Script field of TournamentScriptsToSkip
+        :return: frozenset of OverviewPages to skip
+        """
+        if self.tournaments_to_skip_cache is None:
+            self._populate_tournaments_to_skip()
+        return self.tournaments_to_skip_cache.get(script, frozenset())
+
+    def _populate_tournaments_to_skip(self):
+        result = self.cargo_client.query(
+            tables="TournamentScriptsToSkip",
+            fields="Script, OverviewPage"
+        )
+        d = {}
+        for item in result:
+            if item['Script'] not in d:
+                d[item['Script']] = set()
+            d[item['Script']].add(item['OverviewPage'])
+        self.tournaments_to_skip_cache = {script: frozenset(pages) for script, pages in d.items()}
+
     @staticmethod
     def unescape(string):
         if string is None:
@@ -162,30 +308,70 @@ class EsportsLookupCache(object):
         :param player: the current player ID to return the disambiguated name of
         :return: the disambiguated form of the player param
         """
+        resolved, _ = self.get_disambiguated_players_from_event(event, [(team, player)])
+        return resolved.get((team, player))
+
+    def get_disambiguated_players_from_event(self, event, players: List[Tuple[str, str]]):
+        """
+        Returns the disambiguated IDs of several players in the same event at once.
+
+        The event is resolved once, and the Team lookup and the event's player names are each queried
+        at most once, no matter how many players are requested.
+
+        :param event: will be resolved as a redirect if needed
+        :param players: list of (team, player) tuples, where team can be a tricode if needed
+        :return: a dict from each resolved (team, player) tuple to the disambiguated form of the player,
+            and a list of the (team, player) tuples that could not be resolved
+        """
+        from unidecode import unidecode
         if event is None:
             raise InvalidEventError
         event = self.get_target(event)
 
-        # we'll keep all player keys lowercase
-        player_lookup = unidecode(player).lower()
-        team = self.get('Team', team, 'link', allow_fallback=True)
-        disambiguation = self._get_player_from_event_and_team_raw(event, team, player_lookup)
-        if disambiguation is not None:
-            return player + disambiguation
+        lookups = {}
+        for team, player in players:
+            if (team, player) in lookups:
+                continue
+            # we'll keep all player keys lowercase
+            lookups[(team, player)] = (
+                self.get('Team', team, 'link', allow_fallback=True),
+                unidecode(player).lower()
+            )
+
+        resolved = {}
+        missing = []
+        for (team, player), (team_link, player_lookup) in lookups.items():
+            disambiguation = self._get_player_from_event_and_team_raw(event, team_link, player_lookup)
+            if disambiguation is not None:
+                resolved[(team, player)] = player + disambiguation
+            else:
+                missing.append((team, player))
+        if not missing:
+            return resolved, []
+
         self._populate_event_team_players(event)
-        disambiguation = self._get_player_from_event_and_team_raw(event, team, player_lookup)
-        if disambiguation is not None:
-            return player + disambiguation
-        return None
+        unresolved = []
+        for team, player in missing:
+            team_link, player_lookup = lookups[(team, player)]
+            disambiguation = self._get_player_from_event_and_team_raw(event, team_link, player_lookup)
+            if disambiguation is not None:
+                resolved[(team, player)] = player + disambiguation
+            else:
+                unresolved.append((team, player))
+        return resolved, unresolved
 
     def _get_player_from_event_and_team_raw(self, event, team, player_lookup):
         if event in self.event_playername_cache:
             if team in self.event_playername_cache[event]:
                 if player_lookup in self.event_playername_cache[event][team]:
                     return self.event_playername_cache[event][team][player_lookup]
+            return None
+        if self.roster_table is not None and event not in self.stale_roster_table_events:
+            return self.roster_table.get_player(event, team, player_lookup)
         return None
 
     def _populate_event_team_players(self, event):
+        from unidecode import unidecode
         result = self.cargo_client.query(
             tables="TournamentPlayers=TP,PlayerRedirects=PR1,PlayerRedirects=PR2,LowPriorityRedirects=LPR",
             join_on="TP.Player=PR1.AllName,PR1.OverviewPage=PR2.OverviewPage,PR2.AllName=LPR._pageName",
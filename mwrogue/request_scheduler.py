@@ -0,0 +1,241 @@
+import threading
+import time
+
+from mwclient.errors import APIError
+from requests.exceptions import HTTPError
+
+from .api_hooks import install_api_hooks
+
+READ = 'read'
+CARGO = 'cargo'
+WRITE = 'write'
+
+# actions that don't modify the wiki; anything else is scheduled as a write
+READ_ACTIONS = {'query', 'expandtemplates', 'parse', 'login', 'clientlogin', 'logout', 'paraminfo', 'opensearch'}
+
+# requests per second, per wiki
+DEFAULT_RATES = {
+    READ: 20.0,
+    CARGO: 8.0,
+    WRITE: 2.0,
+}
+
+# seconds to wait after a 429 or maxlag response that doesn't say how long to wait
+DEFAULT_RETRY_AFTER = 5.0
+
+
+def get_operation(action: str):
+    if action == 'cargoquery':
+        return CARGO
+    if action in READ_ACTIONS:
+        return READ
+    return WRITE
+
+
+class TokenBucket(object):
+    """
+    Allows `rate` requests per second on average, with bursts of up to `capacity` requests.
+
+    The rate is halved every time the server says it's overloaded and recovers gradually after
+    every successful request, but never exceeds the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self):
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def penalize(self):
+        self._refill()
+        self.rate = max(self.rate / 2, self.max_rate / 64)
+        self.tokens = min(self.tokens, 0)
+
+    def reward(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RequestScheduler(object):
+    """
+    Schedules API requests so that every client sharing the scheduler has a common view of server load.
+
+    Each wiki gets one token bucket per type of operation (read, Cargo query, write). When the server reports
+    replication lag or responds with a 429, every request to that wiki is paused for the duration the server
+    asks for and the rates for that wiki are reduced, recovering as requests succeed again. Writes also wait
+    while any read or Cargo query to the same wiki is waiting, so that bulk edits don't starve
+    interactive lookups.
+    """
+
+    def __init__(self, rates: dict = None, max_lag: int = 5, max_retries: int = 5):
+        """
+        :param rates: Optional. Dict of operation type (read, cargo, write) to requests per second
+        :param max_lag: maxlag parameter to send with writes, or None to not send one
+        :param max_retries: Number of times to retry a request after a 429 or maxlag error
+        """
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.max_lag = max_lag
+        self.max_retries = max_retries
+        self.buckets = {}
+        self.paused_until = {}
+        self.waiting_interactive = {}
+        self.condition = threading.Condition()
+
+    def _get_bucket(self, wiki, operation):
+        if (wiki, operation) not in self.buckets:
+            self.buckets[(wiki, operation)] = TokenBucket(self.rates[operation])
+        return self.buckets[(wiki, operation)]
+
+    def acquire(self, wiki, operation):
+        """
+        Blocks until a request of the given type may be sent to the wiki
+
+        :param wiki: Any identifier of the wiki, e.g. its host & path
+        :param operation: read, cargo, or write
+        :return: null
+        """
+        interactive = operation != WRITE
+        with self.condition:
+            bucket = self._get_bucket(wiki, operation)
+            if interactive:
+                self.waiting_interactive[wiki] = self.waiting_interactive.get(wiki, 0) + 1
+            try:
+                while True:
+                    wait = max(bucket.time_until_available(), self.paused_until.get(wiki, 0) - time.monotonic())
+                    if not interactive and self.waiting_interactive.get(wiki, 0) > 0:
+                        # woken up when the interactive requests are sent
+                        wait = max(wait, 1)
+                    if wait <= 0:
+                        bucket.consume()
+                        return
+                    self.condition.wait(wait)
+            finally:
+                if interactive:
+                    self.waiting_interactive[wiki] -= 1
+                    self.condition.notify_all()
+
+    def backoff(self, wiki, retry_after: float = None):
+        """
+        Pauses all requests to the wiki and reduces its rates, because the server said it's overloaded
+
+        :param wiki: Any identifier of the wiki, e.g. its host & path
+        :param retry_after: Seconds to pause for
+        :return: null
+        """
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        with self.condition:
+            self.paused_until[wiki] = max(self.paused_until.get(wiki, 0), time.monotonic() + retry_after)
+            for operation in self.rates.keys():
+                self._get_bucket(wiki, operation).penalize()
+            self.condition.notify_all()
+
+    def request(self, wiki, action, call):
+        """
+        Sends a request through the scheduler, retrying it if the server responds with a 429 or maxlag error
+
+        :param wiki: Any identifier of the wiki, e.g. its host & path
+        :param action: The API action of the request
+        :param call: A function with no arguments that sends the request
+        :return: The result of call
+        """
+        operation = get_operation(action)
+        for retry in range(self.max_retries + 1):
+            self.acquire(wiki, operation)
+            try:
+                result = call()
+            except APIError as e:
+                if e.code != 'maxlag' or retry == self.max_retries:
+                    raise e
+                self.backoff(wiki)
+                continue
+            except HTTPError as e:
+                if e.response is None or e.response.status_code != 429 or retry == self.max_retries:
+                    raise e
+                self.backoff(wiki, self._parse_retry_after(e.response.headers.get('Retry-After')))
+                continue
+            with self.condition:
+                self._get_bucket(wiki, operation).reward()
+            return result
+
+    @staticmethod
+    def _parse_retry_after(value):
+        # Retry-After can also be an HTTP date, in which case we just use the default
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def wrap(self, wiki, api):
+        """
+        Wraps a function with the same signature as mwclient.Site.api so that its requests are scheduled
+
+        :param wiki: Any identifier of the wiki, e.g. its host & path
+        :param api: The function to wrap
+        :return: The wrapped function
+        """
+        def scheduled_api(action, http_method='POST', *args, **kwargs):
+            if self.max_lag is not None and get_operation(action) == WRITE and 'maxlag' not in kwargs:
+                kwargs['maxlag'] = self.max_lag
+            return self.request(wiki, action, lambda: api(action, http_method, *args, **kwargs))
+
+        return scheduled_api
+
+    @staticmethod
+    def get_wiki_key(client):
+        return '{}{}'.format(client.host, client.path)
+
+    def install(self, client):
+        """
+        Routes all API calls made by an mwclient Site through this scheduler, and watches its responses
+        for replication lag. If the site already has a different scheduler, it's replaced rather than both
+        being used, since the site may be shared by several clients.
+
+        mwclient itself waits & retries when the server reports lag, so we only use those responses to
+        slow down the other requests to the same wiki.
+
+        :param client: mwclient Site object
+        :return: null
+        """
+        install_api_hooks(client)
+        client.mwrogue_scheduler = self
+        if getattr(client, 'mwrogue_lag_hook', None) is not None or not hasattr(client.connection, 'hooks'):
+            return
+
+        def check_lag(response, *args, **kwargs):
+            # look the scheduler up on every response in case it's been replaced
+            scheduler = getattr(client, 'mwrogue_scheduler', None)
+            if scheduler is not None and response.headers.get('x-database-lag'):
+                scheduler.backoff(scheduler.get_wiki_key(client),
+                                  scheduler._parse_retry_after(response.headers.get('retry-after')))
+
+        client.connection.hooks['response'].append(check_lag)
+        client.mwrogue_lag_hook = check_lag
+
+    @staticmethod
+    def remove(client):
+        """
+        Stops scheduling the API calls of an mwclient Site
+
+        :param client: mwclient Site object
+        :return: null
+        """
+        client.mwrogue_scheduler = None
+
+
+# shared by every EsportsClient that isn't given its own scheduler
+default_scheduler = RequestScheduler()
@@ -0,0 +1,206 @@
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+MAGIC = b'MWRT'
+VERSION = 1
+# written in native byte order, so that a file written on another architecture is detected
+BYTE_ORDER_MARK = 0x01020304
+# magic, version, byte order mark, number of strings, size of string data,
+# number of player events, number of player rows, number of tricode events, number of tricode rows
+HEADER = struct.Struct('=4s8I')
+PLAYER_ROW_WIDTH = 4
+TRICODE_ROW_WIDTH = 3
+
+
+class _StringTable(object):
+    """Sorted, deduplicated strings stored as utf-8 data plus offsets, so that index order is string order"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def index(self, string):
+        i = bisect_left(self, string)
+        if i < len(self) and self[i] == string:
+            return i
+        return None
+
+
+class _Rows(object):
+    """Fixed-width rows of string indices stored in a flat array, sorted so that they can be bisected"""
+
+    def __init__(self, values, width):
+        self.values = values
+        self.width = width
+
+    def __len__(self):
+        return len(self.values) // self.width
+
+    def __getitem__(self, i):
+        return tuple(self.values[i * self.width:(i + 1) * self.width])
+
+    def find(self, key):
+        """
+        :param key: tuple of all but the last column of a row
+        :return: last column of the row starting with key, or None if there's no such row
+        """
+        i = bisect_left(self, key)
+        if i < len(self):
+            row = self[i]
+            if row[:-1] == key:
+                return row[-1]
+        return None
+
+
+def _contains(values, value):
+    i = bisect_left(values, value)
+    return i < len(values) and values[i] == value
+
+
+class RosterTable(object):
+    """
+    Compact, read-only copy of the per-event roster caches of EsportsLookupCache (`event_playername_cache` and
+    `event_tricode_cache`).
+
+    Every string is stored once in a sorted string table, and each cache is stored as sorted rows of integer
+    indices into that table. The whole thing can be saved to a single binary file and loaded back with mmap,
+    in which case nothing is copied into Python objects until it's looked up, so worker processes can share
+    the same pages instead of each holding their own dicts.
+    """
+
+    def __init__(self, strings: _StringTable, player_events, player_rows, tricode_events, tricode_rows,
+                 buffer=None):
+        self.strings = strings
+        self.player_events = player_events
+        self.player_rows = _Rows(player_rows, PLAYER_ROW_WIDTH)
+        self.tricode_events = tricode_events
+        self.tricode_rows = _Rows(tricode_rows, TRICODE_ROW_WIDTH)
+        # keep the mmap alive for as long as we're using views into it
+        self.buffer = buffer
+
+    @classmethod
+    def from_caches(cls, event_playername_cache: dict, event_tricode_cache: dict):
+        """
+        :param event_playername_cache: dict of event -> team -> player lookup -> disambiguation
+        :param event_tricode_cache: dict of event -> tricode -> team link
+        :return: RosterTable
+        """
+        all_strings = set(event_playername_cache.keys()) | set(event_tricode_cache.keys())
+        for teams in event_playername_cache.values():
+            for team, players in teams.items():
+                all_strings.add(team)
+                all_strings.update(players.keys())
+                all_strings.update(players.values())
+        for tricodes in event_tricode_cache.values():
+            all_strings.update(tricodes.keys())
+            all_strings.update(tricodes.values())
+        sorted_strings = sorted(all_strings)
+        string_index = {string: i for i, string in enumerate(sorted_strings)}
+
+        offsets = array('I', [0])
+        data = bytearray()
+        for string in sorted_strings:
+            data += string.encode('utf-8')
+            offsets.append(len(data))
+
+        player_rows = []
+        for event, teams in event_playername_cache.items():
+            for team, players in teams.items():
+                for player, disambiguation in players.items():
+                    player_rows.append((string_index[event], string_index[team], string_index[player],
+                                        string_index[disambiguation]))
+        tricode_rows = []
+        for event, tricodes in event_tricode_cache.items():
+            for tricode, link in tricodes.items():
+                tricode_rows.append((string_index[event], string_index[tricode], string_index[link]))
+
+        return cls(
+            _StringTable(offsets, bytes(data)),
+            array('I', sorted(string_index[_] for _ in event_playername_cache.keys())),
+            array('I', [_ for row in sorted(player_rows) for _ in row]),
+            array('I', sorted(string_index[_] for _ in event_tricode_cache.keys())),
+            array('I', [_ for row in sorted(tricode_rows) for _ in row]),
+        )
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(self.strings), len(self.strings.data),
+                                len(self.player_events), len(self.player_rows),
+                                len(self.tricode_events), len(self.tricode_rows)))
+            for values in (self.strings.offsets, self.player_events, self.player_rows.values,
+                           self.tricode_events, self.tricode_rows.values):
+                f.write(memoryview(values).cast('B'))
+            f.write(self.strings.data)
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True):
+        """
+        :param path: Path of a file written by RosterTable.save
+        :param use_mmap: If True, memory-map the file rather than reading it into memory
+        :return: RosterTable
+        """
+        with open(path, 'rb') as f:
+            if use_mmap:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+        view = memoryview(buffer)
+        magic, version, byte_order_mark, num_strings, data_size, num_player_events, num_player_rows, \
+            num_tricode_events, num_tricode_rows = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} roster table file'.format(path, VERSION))
+        if byte_order_mark != BYTE_ORDER_MARK:
+            raise ValueError('{} was written on a machine with a different byte order than {}'.format(
+                path, sys.byteorder))
+
+        position = HEADER.size
+        sections = []
+        for length in (num_strings + 1, num_player_events, num_player_rows * PLAYER_ROW_WIDTH,
+                       num_tricode_events, num_tricode_rows * TRICODE_ROW_WIDTH):
+            size = length * array('I').itemsize
+            sections.append(view[position:position + size].cast('I'))
+            position += size
+        offsets, player_events, player_rows, tricode_events, tricode_rows = sections
+        strings = _StringTable(offsets, view[position:position + data_size])
+        return cls(strings, player_events, player_rows, tricode_events, tricode_rows, buffer=buffer)
+
+    def _event_index(self, event, events):
+        i = self.strings.index(event)
+        if i is None or not _contains(events, i):
+            return None
+        return i
+
+    def has_player_event(self, event):
+        return self._event_index(event, self.player_events) is not None
+
+    def has_tricode_event(self, event):
+        return self._event_index(event, self.tricode_events) is not None
+
+    def get_player(self, event, team, player_lookup):
+        """
+        :return: Disambiguation of the player, as in EsportsLookupCache.event_playername_cache, or None
+        """
+        key = (self.strings.index(event), self.strings.index(team), self.strings.index(player_lookup))
+        if None in key:
+            return None
+        result = self.player_rows.find(key)
+        return None if result is None else self.strings[result]
+
+    def get_tricode(self, event, tricode):
+        """
+        :return: Team link, as in EsportsLookupCache.event_tricode_cache, or None
+        """
+        key = (self.strings.index(event), self.strings.index(tricode))
+        if None in key:
+            return None
+        result = self.tricode_rows.find(key)
+        return None if result is None else self.strings[result]
@@ -1,7 +1,8 @@
-from typing import Union, Optional
+from typing import Union, Optional, List
 
 from mwcleric.template_modifier import TemplateModifierBase as MwclericTemplateModifier
 from mwparserfromhell.nodes import Template
+from mwparserfromhell.nodes.extras import Parameter
 
 from mwrogue.esports_client import EsportsClient
 
@@ -41,11 +42,19 @@ class TemplateModifierBase(MwclericTemplateModifier):
                     self.current_page.name,
                     ', '.join([str(self.current_template.get(_, _)) for _ in key])))
             return
-        to_restore.remove('backup_key')
-
-        for param in self.current_template.params:
-            self.current_template.remove(param.name.strip())
-
-        for param in to_restore.params:
-            name = param.name.strip()
-            self.current_template.add(param.name, to_restore.get(name).value, preserve_spacing=False)
+        params = [param for param in to_restore.params if param.name.strip() != 'backup_key']
+        self.replace_params(self.current_template, params)
+
+    @staticmethod
+    def replace_params(template: Template, params: List[Parameter]):
+        """
+        Replaces all of a template's parameters with the provided ones in a single pass.
+
+        Removing & adding parameters one at a time is a linear scan of the template each time, which is
+        very slow on large templates such as scoreboards.
+
+        :param template: Template to modify in place
+        :param params: Parameters that the template should have, in order
+        :return: null
+        """
+        template.params[:] = params
@@ -1,16 +1,20 @@
 from re import match
-import dateutil.parser
-from mwparserfromhell.nodes import Template
+from typing import TYPE_CHECKING
+
 from pytz import timezone
 from .wiki_time import WikiTime
 
+if TYPE_CHECKING:
+    from mwparserfromhell.nodes import Template
+
 
 def time_from_str(timestamp: str, tz: timezone = None):
+    import dateutil.parser
     timestamp_parsed = dateutil.parser.parse(timestamp)
     return WikiTime(timestamp_parsed, tz=tz)
 
 
-def time_from_template(template: Template):
+def time_from_template(template: 'Template'):
     """
     Pulls date-time information encoded by a template and returns a WikiTime object.
     If date-time information is missing or incomplete, None is returned instead.
@@ -1,5 +1,11 @@
+import os
+import tempfile
+
 from mwrogue.auth_credentials import AuthCredentials
+from mwrogue.error_reporting.wiki_error import WikiError
+from mwrogue.error_reporting.wiki_script_error import WikiScriptError
 from mwrogue.esports_client import EsportsClient
+from mwrogue.roster_table import RosterTable
 from mwrogue.wiki_time_parser import time_from_str
 
 credentials = AuthCredentials(user_file='me')
@@ -31,6 +37,30 @@ assert site.cache.get_disambiguated_player_from_event(
 
 assert time_from_str("2020-03-27T16:49:18+00:00").dst == 'spring'
 
+# check error records round trip through json
+script_error = None
+try:
+    raise ValueError('bad value')
+except ValueError as e:
+    script_error = WikiScriptError('Some Page', e)
+assert WikiError.from_json(script_error.to_json()).format_for_print() == script_error.format_for_print()
+assert WikiScriptError('Some Page', 'a message').error == 'a message'
+
+# check roster tables round trip through a file
+with tempfile.TemporaryDirectory() as roster_dir:
+    roster_path = os.path.join(roster_dir, 'rosters.bin')
+    RosterTable.from_caches(
+        {'Some Event': {'Some Team': {'koldo': '', 'solo': ' (Colin Earnest)'}}},
+        {'Some Event': {'st': 'Some Team'}}
+    ).save(roster_path)
+    roster_table = RosterTable.load(roster_path)
+    assert roster_table.get_player('Some Event', 'Some Team', 'solo') == ' (Colin Earnest)'
+    assert roster_table.get_player('Some Event', 'Some Team', 'koldo') == ''
+    assert roster_table.get_player('Some Event', 'Some Team', 'nobody') is None
+    assert roster_table.get_tricode('Some Event', 'st') == 'Some Team'
+    assert not roster_table.has_player_event('Other Event')
+    del roster_table
+
 # check special character
 assert site.cache.get_disambiguated_player_from_event(
     'Belgian League 2020 Summer', 'Aethra Esports', 'Tuomarí') == 'Tuomarí'
@@ -44,6 +74,11 @@ assert site.cache.get_team_from_event_tricode('Ultraliga Season 5 Promotion', 'S
 assert site.cache.get_disambiguated_player_from_event(
     'LCS 2020 Summer', 'FLY', 'Solo') == 'Solo (Colin Earnest)'
 
+# check batch disambiguation, including a player who can't be resolved
+assert site.cache.get_disambiguated_players_from_event(
+    'LCS 2020 Summer', [('FLY', 'Solo'), ('FLY', 'Nobody')]
+) == ({('FLY', 'Solo'): 'Solo (Colin Earnest)'}, [('FLY', 'Nobody')])
+
 # check tournaments to script
 assert "Music X Esports: Hyperplay 2018" in site.tournaments_to_skip('mhtowinners')
 